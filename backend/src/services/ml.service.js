@@ -5,7 +5,10 @@ exports.getMLDecision = async (features) => {
     const url = process.env.ML_SERVICE_URL + "/calculate-risk";
     console.log("Calling ML service at:", url);   // ← add this to debug
 
-    const response = await axios.post(url, features, { timeout: 10000 });
+    // ML service answers within its own latency budget (degrading to
+    // heuristics if needed), so a long timeout only delays the fallback
+    const timeout = Number(process.env.ML_TIMEOUT_MS) || 2000;
+    const response = await axios.post(url, features, { timeout });
     console.log("ML response:", response.data);    // ← and this
 
     return response.data;
@@ -13,6 +16,6 @@ exports.getMLDecision = async (features) => {
   } catch (error) {
     console.error("ML service error:", error.message);  // ← see exact error
     // fallback
-    return { final_risk_score: 50, decision: "SOFT_CAPTCHA", attack_intensity: 0, user_trust: 0 };
+    return { final_risk_score: 50, decision: "SOFT_CAPTCHA", attack_intensity: 0, user_trust: 0, mode: "fallback" };
   }
 };
\ No newline at end of file
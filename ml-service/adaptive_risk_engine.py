@@ -11,14 +11,43 @@ Decision flow:
 
 Heuristics separate Confused Human from Stealth Bot since the ML model
 outputs ~0.50 for both (identical feature distributions by design).
+
+Pre-model triage (returned as "triage" when it fires):
+  honeypot     hidden field filled → BLOCK
+  volumetric   requestsPerMinute / sessionRequestCount beyond
+               TRIAGE_MAX_RPM / TRIAGE_MAX_SESSION_REQUESTS → BLOCK
+  Decided straight from the parsed payload — no DataFrame, no model;
+  only the trust and attack intensity updates are applied.
+
+Operating modes (returned as "mode" in every response):
+  full       ML + boost + trust, Redis state read and updated
+  degraded   Redis unavailable (circuit open) → ML + boost only,
+             no trust offset, last-known attack intensity
+  heuristic  CPU saturated or latency budget spent → no model call,
+             score = HEURISTIC_BASE_SCORE + boost, honeypot still blocks
 """
 
+import os
+import threading
+import time
+
 import joblib
 import numpy as np
 import pandas as pd
+from redis.exceptions import RedisError
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from cpu_monitor import CpuMonitor
+from explainer import ContributionExplainer
+from post_model import PostModelStage, DECISIONS
 from remapper import PiecewiseLinearRemapper
 from redis_state import RedisState
 
+MODES = ("full", "degraded", "heuristic")
+
+# Neutral score used when the model is skipped — lands in SOFT_CAPTCHA
+# without a boost (same as the backend fallback), HARD_CAPTCHA with one
+HEURISTIC_BASE_SCORE = 50.0
+
 
 class AdaptiveRiskEngine:
 
@@ -69,6 +98,39 @@ class AdaptiveRiskEngine:
         self.base_hard  = 80   # scores below this → HARD_CAPTCHA
         self.decay_rate = 0.95
 
+        # Remap → boost → trust → clamp → thresholds in one stage
+        self.post_model = PostModelStage(self.remapper, self.base_allow,
+                                         self.base_soft, self.base_hard)
+
+        # Load shedding
+        self.latency_budget    = float(os.getenv("LATENCY_BUDGET_MS", 250)) / 1000
+        # Fraction of this service's CPU allowance (see cpu_monitor.py)
+        self.shed_load_per_cpu = float(os.getenv("SHED_LOAD_PER_CPU", 0.9))
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("REDIS_BREAKER_FAILURES", 3)),
+            reset_timeout=float(os.getenv("REDIS_BREAKER_RESET", 5.0)),
+            exceptions=(RedisError,),
+        )
+        self.last_intensity = 0.0   # last value read from / written to Redis
+        self.model_latency  = 0.0   # EWMA of model inference time (seconds)
+
+        self.cpu             = CpuMonitor()
+        self._metrics_lock   = threading.Lock()
+        self.mode_counts     = {mode: 0 for mode in MODES}
+
+        # Pre-model triage — a threshold of 0 disables that check.
+        # Defaults sit well above the overlap zone (rpm 7–20,
+        # sessionRequestCount up to ~140) so only volumetric bots trip them.
+        self.triage_max_rpm      = float(os.getenv("TRIAGE_MAX_RPM", 60))
+        self.triage_max_requests = float(os.getenv("TRIAGE_MAX_SESSION_REQUESTS", 300))
+
+        # Requests that never reached the model, by reason
+        self.bypass_counts = {"honeypot": 0, "volumetric": 0,
+                              "cpu_shed": 0, "latency_budget": 0}
+
+        # Built on first explain=True request
+        self._explainer = None
+
     # ----------------------------------
     # Score Remapping
     # Maps raw P(bot) into target bands:
@@ -80,24 +142,96 @@ class AdaptiveRiskEngine:
     def remap_score(self, raw_prob: float) -> float:
         return self.remapper.transform(raw_prob)
 
+    # ----------------------------------
+    # Explanations (lazy)
+    # ----------------------------------
+    @property
+    def explainer(self):
+        if self._explainer is None:
+            self._explainer = ContributionExplainer(self.model, self.feature_order)
+        return self._explainer
+
+    def explanation(self, session, scaled=None, raw_values=None, triage=None):
+        rules = [{"rule": name, "points": points}
+                 for name, points in self.protection_rules(session)]
+        if triage:
+            rules.insert(0, {"rule": triage, "points": None})
+        features = [] if scaled is None else self.explainer.explain(scaled[0], raw_values)
+        return {"features": features, "rules": rules}
+
     # ----------------------------------
     # Update Attack Intensity
     # ----------------------------------
     def update_attack_intensity(self, latest_score):
-        current  = self.redis.get_attack_intensity()
+        current  = self.breaker.call(self.redis.get_attack_intensity)
         current *= self.decay_rate
         current += latest_score / 150
         current  = min(1, current)
-        self.redis.set_attack_intensity(float(current))
+        self.breaker.call(self.redis.set_attack_intensity, float(current))
+        self.last_intensity = current
         return current
 
+    # ----------------------------------
+    # Redis State Update (breaker-guarded)
+    # Returns (attack_intensity, trust_score, ok). When Redis is down
+    # the last-known intensity is used and trust is left untouched.
+    # ----------------------------------
+    def update_state(self, user_id, final_score, trust_delta, trust_score=None):
+        try:
+            attack_intensity = self.update_attack_intensity(final_score)
+            if trust_score is None:
+                trust_score = self.breaker.call(self.redis.get_user_trust, user_id)
+            new_trust = max(-50, min(50, trust_score + trust_delta))
+            self.breaker.call(self.redis.set_user_trust, user_id, int(new_trust))
+            return attack_intensity, new_trust, True
+        except (RedisError, CircuitOpenError):
+            # Report the stored value, not a delta that was never saved
+            return self.last_intensity, trust_score or 0, False
+
+    # ----------------------------------
+    # Load Shedding
+    # ----------------------------------
+    def cpu_saturated(self):
+        return self.cpu.sample() >= self.shed_load_per_cpu
+
+    def select_mode(self):
+        if self.cpu_saturated():
+            return "heuristic"
+        if self.breaker.state == "open":
+            return "degraded"
+        return "full"
+
+    def record_mode(self, mode, bypass=None):
+        with self._metrics_lock:
+            self.mode_counts[mode] += 1
+            if bypass:
+                self.bypass_counts[bypass] += 1
+
+    def metrics(self):
+        # Per worker process — uvicorn --workers N keeps N separate counters
+        with self._metrics_lock:
+            counts = dict(self.mode_counts)
+            bypass = dict(self.bypass_counts)
+        return {
+            "mode_counts":          counts,
+            "requests_total":       sum(counts.values()),
+            "model_bypassed":       bypass,
+            "model_bypassed_total": sum(bypass.values()),
+            "redis_breaker":        self.breaker.state,
+            "cpu_utilisation":      round(self.cpu.utilisation, 3),
+            "model_latency_ms":     round(self.model_latency * 1000, 2),
+            "last_intensity":       round(self.last_intensity, 3),
+            "explain_cache":        self._explainer.cache_stats() if self._explainer else None,
+        }
+
     # ----------------------------------
     # Exploit Protection Layer
     # ----------------------------------
-    def protection_boost(self, session):
+    def protection_rules(self, session):
         """
         Heuristic boosts that separate Confused Human (~no boost)
         from Stealth Bot (~+20) since ML score is ~0.50 for both.
+        Returns the (rule, points) pairs that fired.
 
         Confused Human profile:  burstScore ~0.38, clickRandomness ~0.48,
                                  avgTypingSpeed ~12, typingVariance ~1.8,
@@ -106,123 +240,195 @@ class AdaptiveRiskEngine:
                                  avgTypingSpeed ~15, typingVariance ~1.2,
                                  rpm ~14.5, sessionRequestCount ~88
         """
-        boost = 0
+        rules = []
 
         # High request volume — strong bot signal
         if session["sessionRequestCount"] > 150:
-            boost += 10
+            rules.append(("high_request_volume", 10))
 
         # Burst + low click randomness — stealth bot combo
         # Stealth:  burstScore=0.52, clickRandomness=0.35 → triggers
         # Confused: burstScore=0.38, clickRandomness=0.48 → misses
         if session["burstScore"] > 0.45 and session["clickRandomnessScore"] < 0.45:
-            boost += 12
+            rules.append(("burst_low_click_randomness", 12))
 
         # Fast typing + low variance — mechanical pattern
         # Stealth:  avgSpeed=15.1, variance=1.2 → triggers
         # Confused: avgSpeed=12.4, variance=1.8 → misses
         if session["typingVariance"] < 0.9 and session["avgTypingSpeed"] > 13:
-            boost += 8
+            rules.append(("mechanical_typing", 8))
 
         # High RPM + low randomness — sustained automated traffic
         # Stealth:  rpm=14.5, clickRandomness=0.35 → triggers
         # Confused: rpm=11.2, clickRandomness=0.48 → misses
         if session["requestsPerMinute"] > 12 and session["clickRandomnessScore"] < 0.45:
-            boost += 6
+            rules.append(("high_rpm_low_click_randomness", 6))
+
+        return rules
 
+    def protection_boost(self, session):
+        boost = sum(points for _, points in self.protection_rules(session))
         return min(boost, 20)   # cap raised from 12 to 20
 
     # ----------------------------------
-    # MAIN RISK FUNCTION
+    # Dynamic Thresholds — tighten during active attacks
+    # e.g. max intensity=1.0 → dynamic_soft = 62-5 = 57, still covers 55 ✓
     # ----------------------------------
-    def calculate_risk(self, session_dict, user_id="anonymous"):
+    def decide(self, final_score, attack_intensity):
+        return DECISIONS[self.post_model.decisions(final_score, attack_intensity)]
 
-        df      = pd.DataFrame([session_dict])
-        epsilon = 1e-6
+    # ----------------------------------
+    # Pre-model Triage
+    # Works on the raw payload — runs before any DataFrame is built.
+    # Returns (reason, trust_delta) or None for ambiguous traffic.
+    # ----------------------------------
+    def triage(self, session):
+        if session["honeypotTriggered"] == 1:
+            return "honeypot", -5
+        if self.triage_max_rpm and session["requestsPerMinute"] > self.triage_max_rpm:
+            return "volumetric", -2
+        if self.triage_max_requests and session["sessionRequestCount"] > self.triage_max_requests:
+            return "volumetric", -2
+        return None
 
-        # Derived features
-        df["typingConsistency"]    = df["avgTypingSpeed"]    / (df["typingVariance"] + epsilon)
-        df["movementEfficiency"]   = df["mousePathLength"]   / (df["mouseMoveCount"] + epsilon)
-        df["interactionIntensity"] = df["mouseMoveCount"]    + df["sessionRequestCount"]
-        df["trafficPressure"]      = df["requestsPerMinute"] * df["burstScore"]
+    # ----------------------------------
+    # MAIN RISK FUNCTION
+    # ----------------------------------
+    def calculate_risk(self, session_dict, user_id="anonymous", explain=False):
 
-        honeypot_flag = df["honeypotTriggered"].values[0]
+        started = time.perf_counter()
+        mode    = self.select_mode()
 
         # ------------------------------
-        # HARD HONEYPOT — instant block
+        # TRIAGE — honeypot / volumetric bots skip the model
         # ------------------------------
-        if honeypot_flag == 1:
-            final_score      = 100.0
-            attack_intensity = self.update_attack_intensity(final_score)
-            trust_score      = self.redis.get_user_trust(user_id)
-            trust_score      = max(-50, min(50, trust_score - 5))
-            self.redis.set_user_trust(user_id, int(trust_score))
-            return {
+        triaged = self.triage(session_dict)
+        if triaged:
+            reason, trust_delta = triaged
+            final_score = 100.0
+            attack_intensity, trust_score, ok = self.update_state(user_id, final_score, trust_delta)
+            if not ok and mode == "full":
+                mode = "degraded"
+            self.record_mode(mode, bypass=reason)
+            result = {
                 "final_risk_score": final_score,
                 "attack_intensity": float(attack_intensity),
                 "user_trust":       trust_score,
-                "decision":         "BLOCK"
+                "decision":         "BLOCK",
+                "mode":             mode,
+                "triage":           reason
+            }
+            if explain:
+                result["explanation"] = self.explanation(session_dict, triage=reason)
+            return result
+
+        # Heuristic boost — separates Stealth Bot from Confused Human
+        boost = self.protection_boost(session_dict)
+
+        # ------------------------------
+        # HEURISTIC MODE — skip the model under CPU saturation
+        # ------------------------------
+        if mode == "heuristic":
+            final_score = max(0, min(100, HEURISTIC_BASE_SCORE + boost))
+            self.record_mode(mode, bypass="cpu_shed")
+            result = {
+                "final_risk_score": round(final_score, 2),
+                "attack_intensity": round(self.last_intensity, 3),
+                "user_trust":       0,
+                "decision":         self.decide(final_score, self.last_intensity),
+                "mode":             mode
+            }
+            if explain:
+                result["explanation"] = self.explanation(session_dict)
+            return result
+
+        # Trust read — an unreachable Redis drops us to degraded mode
+        trust_score = 0
+        if mode == "full":
+            try:
+                trust_score = self.breaker.call(self.redis.get_user_trust, user_id)
+            except (RedisError, CircuitOpenError):
+                mode = "degraded"
+
+        # Latency budget — a slow Redis round-trip can leave no room for
+        # the model; fall back to heuristics rather than blow the budget
+        if time.perf_counter() - started + self.model_latency > self.latency_budget:
+            # Decay as if the model had run instantly, so one stall cannot
+            # keep the model switched off for the life of the worker
+            self.model_latency *= 0.8
+            final_score = max(0, min(100, HEURISTIC_BASE_SCORE + boost - trust_score * 0.5))
+            self.record_mode("heuristic", bypass="latency_budget")
+            result = {
+                "final_risk_score": round(final_score, 2),
+                "attack_intensity": round(self.last_intensity, 3),
+                "user_trust":       trust_score,
+                "decision":         self.decide(final_score, self.last_intensity),
+                "mode":             "heuristic"
             }
+            if explain:
+                result["explanation"] = self.explanation(session_dict)
+            return result
 
         # ------------------------------
         # ML SCORE
         # ------------------------------
+        model_started = time.perf_counter()
+        df      = pd.DataFrame([session_dict])
+        epsilon = 1e-6
+
+        # Derived features
+        df["typingConsistency"]    = df["avgTypingSpeed"]    / (df["typingVariance"] + epsilon)
+        df["movementEfficiency"]   = df["mousePathLength"]   / (df["mouseMoveCount"] + epsilon)
+        df["interactionIntensity"] = df["mouseMoveCount"]    + df["sessionRequestCount"]
+        df["trafficPressure"]      = df["requestsPerMinute"] * df["burstScore"]
+
         df_ml  = df.drop(["honeypotTriggered"], axis=1)
         df_ml  = df_ml[self.feature_order]
         scaled = self.scaler.transform(df_ml)
 
         # Raw P(bot) from calibrated XGBoost
         bot_prob_raw = self.model.predict_proba(scaled)[0][0]
-
-        # ── REMAPPING LAYER ──────────────────────────────────────
-        # Maps raw probability into target bands before scoring.
+        # Samples capped at the budget — a single stall moves the EWMA by
+        # at most 0.2 × budget
+        sample = min(time.perf_counter() - model_started, self.latency_budget)
+        self.model_latency = 0.8 * self.model_latency + 0.2 * sample
+
+        # ── REMAPPING + SCORING ──────────────────────────────────
+        # Maps raw probability into target bands, then applies the
+        # heuristic boost (Stealth Bot vs Confused Human) and the trust
+        # adjustment (penalises known bots, rewards known humans).
         #   Before: Clear Human ~0.03, Clear Bot ~0.96
         #   After:  Clear Human ~0.10, Clear Bot ~0.87
-        bot_prob = self.remap_score(bot_prob_raw)
+        bot_prob, final_score = self.post_model.scores(bot_prob_raw, boost, trust_score)
         # ─────────────────────────────────────────────────────────
 
-        final_score = float(bot_prob * 100)
-
-        # Heuristic boost — separates Stealth Bot from Confused Human
-        final_score += self.protection_boost(session_dict)
-
-        # Trust adjustment — penalises known bots, rewards known humans
-        trust_score  = self.redis.get_user_trust(user_id)
-        final_score -= trust_score * 0.5
-        final_score  = max(0, min(100, final_score))
-
-        attack_intensity = self.update_attack_intensity(final_score)
-
-        # Update trust memory
-        if final_score < 25:
-            trust_score += 2
-        elif final_score > 70:
-            trust_score -= 2
-        trust_score = max(-50, min(50, trust_score))
-        self.redis.set_user_trust(user_id, int(trust_score))
-
-        # Dynamic thresholds — tighten during active attacks
-        # soft multiplier is 5 (not 10) — attack intensity must not push
-        # confused humans (score ~48–55) out of the SOFT zone.
-        # e.g. max intensity=1.0 → dynamic_soft = 62-5 = 57, still covers 55 ✓
-        dynamic_allow = self.base_allow - (attack_intensity * 10)
-        dynamic_soft  = self.base_soft  - (attack_intensity * 5)   # fixed: was ×10
-        dynamic_hard  = self.base_hard  - (attack_intensity * 5)
-
-        if final_score < dynamic_allow:
-            decision = "ALLOW"
-        elif final_score < dynamic_soft:
-            decision = "SOFT_CAPTCHA"
-        elif final_score < dynamic_hard:
-            decision = "HARD_CAPTCHA"
+        if mode == "full":
+            # Update trust memory
+            if final_score < 25:
+                trust_delta = 2
+            elif final_score > 70:
+                trust_delta = -2
+            else:
+                trust_delta = 0
+            attack_intensity, trust_score, ok = self.update_state(
+                user_id, final_score, trust_delta, trust_score)
+            if not ok:
+                mode = "degraded"
         else:
-            decision = "BLOCK"
+            attack_intensity = self.last_intensity
 
-        return {
+        decision = self.decide(final_score, attack_intensity)
+        self.record_mode(mode)
+
+        result = {
             "final_risk_score": round(final_score, 2),
             "raw_bot_prob":     round(bot_prob_raw, 4),
             "remapped_prob":    round(bot_prob, 4),
             "attack_intensity": round(attack_intensity, 3),
             "user_trust":       trust_score,
-            "decision":         decision
-        }
\ No newline at end of file
+            "decision":         decision,
+            "mode":             mode
+        }
+        if explain:
+            result["explanation"] = self.explanation(session_dict, scaled, df_ml.values[0])
+        return result
@@ -0,0 +1,136 @@
+"""
+bench_post_model.py
+===================
+Fuzz-checks the fused post-model stage (post_model.py + the lookup-table
+remapper) against the original per-request pipeline:
+
+  bot_prob    = float(np.interp(raw, xp, fp))
+  final_score = float(bot_prob * 100) + boost - trust * 0.5, clamped
+  decision    = dynamic thresholds from attack_intensity
+
+Results must match bit for bit on both the scalar and the array path.
+Then times each path.
+
+Usage:
+  python bench_post_model.py --samples 200000
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+from post_model import PostModelStage, DECISIONS
+from remapper import PiecewiseLinearRemapper
+
+# Same anchors and thresholds as AdaptiveRiskEngine
+ANCHORS = [
+    (0.00, 0.03), (0.04, 0.10), (0.10, 0.20), (0.20, 0.25),
+    (0.35, 0.30), (0.50, 0.50), (0.65, 0.70), (0.80, 0.75),
+    (0.90, 0.80), (0.96, 0.87), (1.00, 0.97),
+]
+BASE_ALLOW, BASE_SOFT, BASE_HARD = 25, 62, 80
+
+
+def reference(raw, boost, trust, attack_intensity, xp, fp):
+    bot_prob    = float(np.interp(raw, xp, fp))
+    final_score = float(bot_prob * 100)
+    final_score += boost
+    final_score -= trust * 0.5
+    final_score  = max(0, min(100, final_score))
+
+    dynamic_allow = BASE_ALLOW - (attack_intensity * 10)
+    dynamic_soft  = BASE_SOFT  - (attack_intensity * 5)
+    dynamic_hard  = BASE_HARD  - (attack_intensity * 5)
+    if final_score < dynamic_allow:
+        decision = "ALLOW"
+    elif final_score < dynamic_soft:
+        decision = "SOFT_CAPTCHA"
+    elif final_score < dynamic_hard:
+        decision = "HARD_CAPTCHA"
+    else:
+        decision = "BLOCK"
+    return bot_prob, final_score, decision
+
+
+def fuzz_inputs(n, rng):
+    xp = np.array([a[0] for a in ANCHORS])
+
+    # Uniform draws plus anchors, their float neighbours and out-of-range values
+    edges = np.concatenate([
+        xp, np.nextafter(xp, -np.inf), np.nextafter(xp, np.inf),
+        [-1.0, -1e-300, 1.0 + 1e-12, 2.0, 0.5 + 1e-17],
+    ])
+    raw   = np.concatenate([rng.random(n - len(edges)), edges])
+    boost = rng.integers(0, 21, size=n)
+    trust = rng.integers(-50, 51, size=n)
+    ai    = rng.random(n)
+    ai[rng.random(n) < 0.05] = 1.0
+    return raw, boost, trust, ai
+
+
+def bits(x):
+    return np.asarray(x, dtype=np.float64).view(np.int64)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fuzz and time the fused post-model stage")
+    parser.add_argument("--samples", type=int, default=200000)
+    parser.add_argument("--seed",    type=int, default=42)
+    args = parser.parse_args()
+
+    rng      = np.random.default_rng(args.seed)
+    remapper = PiecewiseLinearRemapper(ANCHORS)
+    stage    = PostModelStage(remapper, BASE_ALLOW, BASE_SOFT, BASE_HARD)
+    xp, fp   = remapper.raw_pts, remapper.target_pts
+
+    raw, boost, trust, ai = fuzz_inputs(args.samples, rng)
+    raw_l, boost_l, trust_l, ai_l = raw.tolist(), boost.tolist(), trust.tolist(), ai.tolist()
+
+    # ── Reference ────────────────────────────────────────────
+    t0  = time.perf_counter()
+    ref = [reference(r, b, t, a, xp, fp) for r, b, t, a in zip(raw_l, boost_l, trust_l, ai_l)]
+    t_ref = time.perf_counter() - t0
+    ref_prob  = np.array([r[0] for r in ref])
+    ref_score = np.array([r[1] for r in ref], dtype=np.float64)
+    ref_dec   = [r[2] for r in ref]
+
+    # ── Fused, scalar path ───────────────────────────────────
+    t0 = time.perf_counter()
+    scalar = [stage(r, b, t, a) for r, b, t, a in zip(raw_l, boost_l, trust_l, ai_l)]
+    t_scalar = time.perf_counter() - t0
+
+    # ── Fused, array path ────────────────────────────────────
+    t0 = time.perf_counter()
+    arr_prob, arr_score, arr_codes = stage(raw, boost, trust, ai)
+    t_array = time.perf_counter() - t0
+
+    failures = 0
+    checks = {
+        "scalar remapped": bits([s[0] for s in scalar]) == bits(ref_prob),
+        "scalar score":    bits([s[1] for s in scalar]) == bits(ref_score),
+        "scalar decision": np.array([DECISIONS[s[2]] == d for s, d in zip(scalar, ref_dec)]),
+        "array remapped":  bits(arr_prob) == bits(ref_prob),
+        "array score":     bits(arr_score) == bits(ref_score),
+        "array decision":  np.array([DECISIONS[c] == d for c, d in zip(arr_codes, ref_dec)]),
+    }
+
+    print("=" * 65)
+    print(f"POST-MODEL STAGE FUZZ  ({args.samples} samples, seed {args.seed})")
+    print("=" * 65)
+    for name, ok in checks.items():
+        mismatches = int(np.sum(~ok))
+        failures  += mismatches
+        status     = "PASS" if mismatches == 0 else "FAIL"
+        print(f"  {name:<16} mismatches={mismatches:<8} [{status}]")
+        if mismatches:
+            idx = int(np.argmax(~ok))
+            print(f"    first: raw={raw[idx]!r} boost={boost[idx]} trust={trust[idx]} ai={ai[idx]!r}")
+
+    print("\n" + "=" * 65)
+    print("TIMING")
+    print("=" * 65)
+    for name, t in (("reference", t_ref), ("fused scalar", t_scalar), ("fused array", t_array)):
+        print(f"  {name:<13} {t * 1000:9.1f} ms   {t / args.samples * 1e9:8.1f} ns/request")
+
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,75 @@
+"""
+bench_trust_storage.py
+======================
+Compares Redis memory used by the two trust layouts (see redis_state.py):
+  string — user_trust:{user_id}
+  hash   — trust_bucket:{n} → {user_id: trust}
+
+Writes N synthetic users into a scratch database for each layout and
+reports used_memory per million users.
+
+Usage:
+  python bench_trust_storage.py --url redis://localhost:6379/15 --users 500000
+
+WARNING: the target database is FLUSHED before each run.
+"""
+
+import argparse
+import random
+
+import redis
+from redis_state import RedisState
+
+
+def measure(url, storage, users, buckets, batch=5000):
+    client = redis.from_url(url, decode_responses=True)
+    client.flushdb()
+    before = client.info("memory")["used_memory"]
+
+    state = RedisState(urls=[url], trust_storage=storage, trust_buckets=buckets,
+                       socket_timeout=None)
+    rng   = random.Random(42)
+    pipe  = client.pipeline(transaction=False)
+    for i in range(users):
+        user_id = f"user_{i:09d}"
+        trust   = rng.randint(-50, 50)
+        if storage == "hash":
+            pipe.hset(state.trust_bucket_key(user_id), user_id, trust)
+        else:
+            pipe.set(f"user_trust:{user_id}", trust)
+        if (i + 1) % batch == 0:
+            pipe.execute()
+    pipe.execute()
+
+    after = client.info("memory")["used_memory"]
+    keys  = client.dbsize()
+    client.flushdb()
+    return after - before, keys
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark trust storage memory")
+    parser.add_argument("--url",     default="redis://localhost:6379/15")
+    parser.add_argument("--users",   type=int, default=500000)
+    parser.add_argument("--buckets", type=int, default=None,
+                        help="Hash buckets (default: scaled to ~76 users per bucket)")
+    args = parser.parse_args()
+
+    # Scale buckets to the sample so each hash holds as many users as it
+    # would with the production bucket count at ~10M users
+    buckets = args.buckets or max(1, args.users // 76)
+
+    print("=" * 65)
+    print(f"TRUST STORAGE MEMORY  ({args.users} users, {buckets} hash buckets)")
+    print("=" * 65)
+
+    results = {}
+    for storage in ("string", "hash"):
+        used, keys = measure(args.url, storage, args.users, buckets)
+        per_million = used / args.users * 1_000_000
+        results[storage] = per_million
+        print(f"  {storage:<7} keys={keys:<10} used={used / 2**20:8.1f} MiB"
+              f"  per 1M users={per_million / 2**20:8.1f} MiB"
+              f"  bytes/user={used / args.users:6.1f}")
+
+    print(f"\n  hash layout uses {results['hash'] / results['string']:.1%} of string layout memory")
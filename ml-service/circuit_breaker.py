@@ -0,0 +1,85 @@
+"""
+circuit_breaker.py
+==================
+Minimal circuit breaker for the Redis state calls.
+
+  closed    → calls go through; consecutive failures are counted
+  open      → calls are refused for `reset_timeout` seconds
+  half-open → one trial call is let through; success closes the
+              breaker, failure re-opens it
+
+Without this, every request during a Redis outage pays the full socket
+timeout before failing.
+"""
+
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+
+    def __init__(self, failure_threshold=3, reset_timeout=5.0, exceptions=(Exception,)):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout     = reset_timeout
+        self.exceptions        = exceptions
+
+        self.failures  = 0
+        self.opened_at = None
+        self._trial    = False
+        self._lock     = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures  = 0
+            self.opened_at = None
+            self._trial    = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+    def release(self):
+        # Frees a half-open trial slot without changing state
+        with self._lock:
+            self._trial = False
+
+    def call(self, fn, *args, **kwargs):
+        if not self.allow():
+            raise CircuitOpenError(f"circuit open for {fn.__name__}")
+        try:
+            result = fn(*args, **kwargs)
+        except self.exceptions:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Not a failure of the backend (e.g. a corrupt value), but the
+            # trial slot must not leak or the breaker never closes again
+            self.release()
+            raise
+        self.record_success()
+        return result
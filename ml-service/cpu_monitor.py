@@ -0,0 +1,90 @@
+"""
+cpu_monitor.py
+==============
+CPU saturation of this service, for load shedding.
+
+  container with a CPU quota (Docker --cpus, Railway)
+      cgroup CPU usage of the container  / quota      (all workers)
+  no quota
+      time.process_time() of this worker / one core   (GIL-bound worker)
+
+Both give the fraction of the CPU allowance used over the last sample
+window (1 s by default) — unlike os.getloadavg(), they ignore other
+tenants on the host and react within a second.
+"""
+
+import threading
+import time
+
+CGROUP_V2_MAX   = "/sys/fs/cgroup/cpu.max"
+CGROUP_V2_STAT  = "/sys/fs/cgroup/cpu.stat"
+CGROUP_V1_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+CGROUP_V1_USAGE = "/sys/fs/cgroup/cpuacct/cpuacct.usage"
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_quota():
+    """CPUs allowed by the cgroup quota, or None when unlimited."""
+    v2 = _read(CGROUP_V2_MAX)
+    if v2:
+        quota, _, period = v2.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+    quota, period = _read(CGROUP_V1_QUOTA), _read(CGROUP_V1_PERIOD)
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def cgroup_usage():
+    """Cumulative CPU seconds used by the cgroup, or None."""
+    stat = _read(CGROUP_V2_STAT)
+    if stat:
+        for line in stat.splitlines():
+            name, _, value = line.partition(" ")
+            if name == "usage_usec":
+                return int(value) / 1e6
+    usage = _read(CGROUP_V1_USAGE)
+    return int(usage) / 1e9 if usage else None
+
+
+class CpuMonitor:
+
+    def __init__(self, window=1.0):
+        self.window = window
+        self.quota  = cgroup_quota()
+
+        if self.quota and cgroup_usage() is not None:
+            self._usage = cgroup_usage
+            self.cpus   = self.quota
+        else:
+            self._usage = time.process_time
+            self.cpus   = 1.0
+
+        self.utilisation = 0.0
+        self._lock       = threading.Lock()
+        self._last_wall  = time.monotonic()
+        self._last_cpu   = self._usage()
+
+    def sample(self):
+        """Utilisation over the last window; re-sampled at most once per window."""
+        now = time.monotonic()
+        if now - self._last_wall < self.window:
+            return self.utilisation
+        with self._lock:
+            wall = now - self._last_wall
+            if wall >= self.window:
+                cpu = self._usage()
+                self.utilisation = (cpu - self._last_cpu) / (wall * self.cpus)
+                self._last_wall  = now
+                self._last_cpu   = cpu
+        return self.utilisation
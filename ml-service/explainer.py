@@ -0,0 +1,116 @@
+"""
+explainer.py
+============
+Per-request feature contributions for the calibrated XGBoost model.
+
+Each CalibratedClassifierCV fold wraps its own XGBClassifier; XGBoost's
+native TreeSHAP (pred_contribs=True) gives exact per-feature log-odds
+contributions for every fold. Those are averaged across folds and negated
+so that a positive value pushes towards P(bot) (class 0) — the isotonic
+calibrators are monotone, so the direction carries over unchanged.
+
+Results are cached on the scaled feature vector rounded to `decimals`
+(0.01 standard deviations by default): repeated bot payloads map to the
+same key and skip the model entirely. Contributions are computed on the
+quantized vector itself, so a cached answer is exactly what a fresh
+computation for that key would return.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import xgboost as xgb
+
+
+class ContributionExplainer:
+
+    def __init__(self, model, feature_order, cache_size=4096, decimals=2, top_k=5):
+        self.boosters      = [c.estimator.get_booster() for c in model.calibrated_classifiers_]
+        self.feature_order = list(feature_order)
+        self.cache_size    = cache_size
+        self.decimals      = decimals
+        self.top_k         = top_k
+
+        self._cache = OrderedDict()
+        self._lock  = threading.Lock()
+        self.hits   = 0
+        self.misses = 0
+
+    # ----------------------------------
+    # TreeSHAP across calibrated folds
+    # ----------------------------------
+    def contributions(self, scaled):
+        """
+        scaled: 2-D array (n_rows × n_features) in scaler space.
+        Returns (n_rows × n_features) contributions towards P(bot);
+        the bias column is dropped.
+        """
+        dmatrix = xgb.DMatrix(np.asarray(scaled, dtype=np.float32))
+        total   = sum(b.predict(dmatrix, pred_contribs=True) for b in self.boosters)
+        return -(total / len(self.boosters))[:, :-1]
+
+    # ----------------------------------
+    # Cached explanations
+    # ----------------------------------
+    def quantize(self, scaled):
+        return np.round(np.asarray(scaled, dtype=np.float32), self.decimals)
+
+    def explain(self, scaled_row, raw_values=None):
+        quantized = self.quantize(scaled_row).ravel()
+        return self.explain_batch(quantized[None, :],
+                                  None if raw_values is None else [raw_values])[0]
+
+    def explain_batch(self, scaled, raw_values=None):
+        """
+        Same quantize-and-cache semantics as explain(); the distinct cache
+        misses of the whole batch go through one TreeSHAP pass per fold.
+        """
+        quantized = self.quantize(np.atleast_2d(scaled))
+        keys      = [row.tobytes() for row in quantized]
+        contribs  = [None] * len(keys)
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    contribs[i] = cached
+                    self.hits += 1
+
+        # Identical rows within the batch are computed once
+        missing = {}
+        for i, c in enumerate(contribs):
+            if c is None:
+                missing.setdefault(keys[i], i)
+        if missing:
+            computed = dict(zip(missing, self.contributions(quantized[list(missing.values())])))
+            with self._lock:
+                self.misses += len(missing)
+                for key, row in computed.items():
+                    self._cache[key] = row
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            contribs = [computed[keys[i]] if c is None else c for i, c in enumerate(contribs)]
+
+        return [
+            self.top_features(row, None if raw_values is None else raw_values[i])
+            for i, row in enumerate(contribs)
+        ]
+
+    def top_features(self, contribs, raw_values=None):
+        order = np.argsort(-np.abs(contribs))[:self.top_k]
+        top   = []
+        for idx in order:
+            entry = {
+                "feature":      self.feature_order[idx],
+                "contribution": round(float(contribs[idx]), 4),
+            }
+            if raw_values is not None:
+                entry["value"] = round(float(raw_values[idx]), 4)
+            top.append(entry)
+        return top
+
+    def cache_stats(self):
+        with self._lock:
+            return {"size": len(self._cache), "hits": self.hits, "misses": self.misses}
@@ -32,6 +32,7 @@ class SessionData(BaseModel):
     burstScore: float
     honeypotTriggered: int
     user_id: str
+    explain: bool = False
 
 
 # ----------------------------
@@ -42,6 +43,14 @@ def root():
     return {"status": "ML service running"}
 
 
+# ----------------------------
+# Metrics — mode counts, breaker state
+# ----------------------------
+@app.get("/metrics")
+def metrics():
+    return engine.metrics()
+
+
 # ----------------------------
 # Risk Endpoint
 # ----------------------------
@@ -50,7 +59,8 @@ def calculate_risk(data: SessionData):
     session_dict = data.dict()
 
     user_id = session_dict.pop("user_id")
+    explain = session_dict.pop("explain")
 
-    result = engine.calculate_risk(session_dict, user_id)
+    result = engine.calculate_risk(session_dict, user_id, explain=explain)
 
     return result
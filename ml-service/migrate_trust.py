@@ -0,0 +1,95 @@
+"""
+migrate_trust.py
+================
+Moves per-user trust keys (user_trust:{user_id}) from a source Redis into
+the bucketed hash layout, sharded across the nodes configured for the
+ML service (REDIS_URLS / REDIS_URL / REDIS_HOST+REDIS_PORT).
+
+Run it only after the service has switched to TRUST_STORAGE=hash. From
+then on the service reads users missing from their bucket from the legacy
+key (TRUST_LEGACY_FALLBACK) and writes them into the hash on their next
+update, so the hash holds the live value and the legacy key goes stale.
+The copy uses HSETNX and never overwrites a value already in the hash.
+A copy made before the switch would leave stale hash entries that the
+fallback no longer reaches, so there is no pre-copy step.
+
+  1. switch the service to TRUST_STORAGE=hash and redeploy
+  2. python migrate_trust.py --source redis://old-redis:6379 --switched
+       (HSETNX backfill; safe to re-run)
+  3. python migrate_trust.py --source redis://old-redis:6379 --switched --delete
+  4. set TRUST_LEGACY_FALLBACK=0
+
+--switched confirms step 1 and is required.
+"""
+
+import argparse
+from collections import defaultdict
+
+import redis
+from redis_state import RedisState, TRUST_KEY_PREFIX
+
+
+def migrate(source, target, batch_size=1000, delete=False):
+    moved   = 0
+    skipped = 0
+    for keys in _scan_batches(source, batch_size):
+        values = source.mget(keys)
+
+        # Group writes per target node so each node gets one pipeline
+        per_node = defaultdict(list)
+        migrated = []
+        for key, value in zip(keys, values):
+            if value is None:
+                continue
+            user_id    = key[len(TRUST_KEY_PREFIX):]
+            bucket_key = target.trust_bucket_key(user_id)
+            per_node[target.ring.node_index(bucket_key)].append((bucket_key, user_id, value))
+            migrated.append(key)
+
+        for node_idx, entries in per_node.items():
+            pipe = target.clients[node_idx].pipeline(transaction=False)
+            for bucket_key, user_id, value in entries:
+                # The hash is the live copy — never overwrite it
+                pipe.hsetnx(bucket_key, user_id, value)
+            written  = sum(pipe.execute())
+            skipped += len(entries) - written
+
+        if delete and migrated:
+            source.delete(*migrated)
+
+        moved += len(migrated)
+        print(f"  migrated {moved} users", end="\r")
+
+    print(f"\nDone: {moved} users processed on {len(target.clients)} node(s), "
+          f"{skipped} already in the hash")
+    return moved
+
+
+def _scan_batches(client, batch_size):
+    batch = []
+    for key in client.scan_iter(match=f"{TRUST_KEY_PREFIX}*", count=batch_size, _type="string"):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate user trust keys to bucketed hashes")
+    parser.add_argument("--source",  required=True, help="Redis URL holding the legacy user_trust:* keys")
+    parser.add_argument("--batch",   type=int, default=1000)
+    parser.add_argument("--buckets", type=int, default=None, help="Override TRUST_BUCKETS")
+    parser.add_argument("--delete",  action="store_true", help="Delete legacy keys after copying")
+    parser.add_argument("--switched", action="store_true",
+                        help="Confirm the service already runs with TRUST_STORAGE=hash")
+    args = parser.parse_args()
+
+    if not args.switched:
+        parser.error("switch the service to TRUST_STORAGE=hash first and pass --switched; "
+                     "a copy made before the switch goes stale")
+
+    source = redis.from_url(args.source, decode_responses=True)
+    target = RedisState(trust_storage="hash", trust_buckets=args.buckets, socket_timeout=None)
+    migrate(source, target, batch_size=args.batch, delete=args.delete)
@@ -0,0 +1,73 @@
+"""
+post_model.py
+=============
+Fused post-model stage: raw P(bot) → remap → +boost → −trust×0.5 →
+clamp [0, 100] → dynamic thresholds → decision code.
+
+Accepts scalars (calculate_risk) or arrays (replays, batch scoring) and
+produces the same doubles as the original per-request arithmetic in
+adaptive_risk_engine.py — bench_post_model.py fuzz-checks this bit for bit.
+
+Decision codes index DECISIONS.
+"""
+
+import numpy as np
+
+DECISIONS = ("ALLOW", "SOFT_CAPTCHA", "HARD_CAPTCHA", "BLOCK")
+
+_SCALARS = (int, float, np.number)
+
+
+class PostModelStage:
+
+    def __init__(self, remapper, base_allow, base_soft, base_hard):
+        self.remapper   = remapper
+        self.base_allow = base_allow
+        self.base_soft  = base_soft
+        self.base_hard  = base_hard
+
+    # ----------------------------------
+    # Scores — (remapped_prob, final_score)
+    # ----------------------------------
+    def scores(self, raw_probs, boosts, trusts):
+        if (isinstance(raw_probs, _SCALARS) and isinstance(boosts, _SCALARS)
+                and isinstance(trusts, _SCALARS)):
+            bot_prob    = self.remapper.transform(raw_probs)
+            final_score = float(bot_prob * 100)
+            final_score += boosts
+            final_score -= trusts * 0.5
+            return bot_prob, max(0, min(100, final_score))
+
+        bot_prob    = self.remapper.transform_array(raw_probs)
+        final_score = bot_prob * 100
+        final_score = final_score + np.asarray(boosts, dtype=np.float64)
+        final_score = final_score - np.asarray(trusts, dtype=np.float64) * 0.5
+        return bot_prob, np.clip(final_score, 0, 100)
+
+    # ----------------------------------
+    # Decisions — codes into DECISIONS
+    # soft multiplier is 5 (not 10) — attack intensity must not push
+    # confused humans (score ~48–55) out of the SOFT zone.
+    # ----------------------------------
+    def decisions(self, final_scores, attack_intensity):
+        dynamic_allow = self.base_allow - (attack_intensity * 10)
+        dynamic_soft  = self.base_soft  - (attack_intensity * 5)
+        dynamic_hard  = self.base_hard  - (attack_intensity * 5)
+
+        if isinstance(final_scores, _SCALARS) and isinstance(attack_intensity, _SCALARS):
+            if final_scores < dynamic_allow:
+                return 0
+            elif final_scores < dynamic_soft:
+                return 1
+            elif final_scores < dynamic_hard:
+                return 2
+            return 3
+
+        s = np.asarray(final_scores, dtype=np.float64)
+        return np.where(s < dynamic_allow, 0,
+               np.where(s < dynamic_soft,  1,
+               np.where(s < dynamic_hard,  2, 3))).astype(np.int8)
+
+    def __call__(self, raw_probs, boosts, trusts, attack_intensity):
+        bot_prob, final_score = self.scores(raw_probs, boosts, trusts)
+        return bot_prob, final_score, self.decisions(final_score, attack_intensity)
@@ -1,28 +1,160 @@
 import os
+import bisect
+from urllib.parse import urlsplit
+import zlib
+import hashlib
 import redis
 
+# Trust storage layouts:
+#   "string" — one key per user:  user_trust:{user_id} → trust
+#   "hash"   — bucketed hashes:   trust_bucket:{n}     → {user_id: trust}
+#
+# Small hashes are stored by Redis as a compact listpack (up to
+# hash-max-listpack-entries, 128 by default), which costs a few bytes per
+# field instead of a full top-level key (~50–70 bytes of dict entry,
+# robj and SDS overhead each). TRUST_BUCKETS should be sized so that
+# users / buckets stays below that limit — 131072 buckets keeps ~76
+# users per bucket at 10M users.
+TRUST_KEY_PREFIX    = "user_trust:"
+TRUST_BUCKET_PREFIX = "trust_bucket:"
+DEFAULT_BUCKETS     = 131072
+VIRTUAL_NODES       = 160
+
+# While moving to the hash layout, users missing from their bucket are read
+# from the legacy user_trust:{id} key and land in the hash on their next
+# trust update. Turn off (TRUST_LEGACY_FALLBACK=0) once the legacy keys
+# are deleted to save the extra GET for new users.
+LEGACY_FALLBACK     = os.getenv("TRUST_LEGACY_FALLBACK", "1") != "0"
+
+# Fail fast on a slow node — the risk engine degrades instead of waiting.
+# Offline tools (migration, benchmarks) pass socket_timeout=None instead.
+SOCKET_TIMEOUT      = float(os.getenv("REDIS_TIMEOUT", 0.1))
+
+
+def node_name(url):
+    """
+    Stable ring name for a node URL: an explicit "name=url" prefix, else the
+    parsed host:port. Password, scheme and db index are left out so that
+    rotating credentials or switching to rediss:// does not move buckets.
+    """
+    name, sep, rest = url.partition("=")
+    if sep and "://" not in name:
+        return name.strip(), rest.strip()
+    parts = urlsplit(url)
+    if parts.scheme == "unix":
+        return parts.path, url
+    return f"{parts.hostname or 'localhost'}:{parts.port or 6379}", url
+
+
+def _node_urls():
+    urls = os.getenv("REDIS_URLS")
+    if urls:
+        return [u.strip() for u in urls.split(",") if u.strip()]
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        return [redis_url]
+    return None
+
+
+class HashRing:
+    """
+    Client-side consistent hashing over several Redis nodes.
+    Each node is placed VIRTUAL_NODES times on the ring so that adding
+    or removing a node only moves ~1/N of the keys.
+    """
+
+    def __init__(self, nodes, replicas=VIRTUAL_NODES):
+        self.nodes = list(nodes)
+        points     = []
+        for idx, name in enumerate(self.nodes):
+            for r in range(replicas):
+                points.append((self._hash(f"{name}#{r}"), idx))
+        points.sort()
+        self._ring  = [p[0] for p in points]
+        self._owner = [p[1] for p in points]
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def node_index(self, key):
+        if len(self.nodes) == 1:
+            return 0
+        pos = bisect.bisect(self._ring, self._hash(key))
+        return self._owner[pos % len(self._ring)]
+
+
 class RedisState:
-    def __init__(self):
-        redis_url = os.getenv("REDIS_URL")
-        if redis_url:
-            self.client = redis.from_url(redis_url, decode_responses=True)
+    def __init__(self, urls=None, trust_storage=None, trust_buckets=None,
+                 socket_timeout=SOCKET_TIMEOUT, legacy_fallback=LEGACY_FALLBACK):
+        urls = urls or _node_urls()
+        if urls:
+            nodes = [node_name(u) for u in urls]
+            names = [n for n, _ in nodes]
+            if len(set(names)) != len(names):
+                raise ValueError("Duplicate Redis node names — use name=url entries in REDIS_URLS")
+            self.clients = [
+                redis.from_url(u, decode_responses=True,
+                               socket_timeout=socket_timeout,
+                               socket_connect_timeout=socket_timeout)
+                for _, u in nodes
+            ]
         else:
-            self.client = redis.Redis(
-                host=os.getenv("REDIS_HOST", "localhost"),
-                port=int(os.getenv("REDIS_PORT", 6379)),
-                decode_responses=True
-            )
+            host = os.getenv("REDIS_HOST", "localhost")
+            port = int(os.getenv("REDIS_PORT", 6379))
+            self.clients = [redis.Redis(host=host, port=port, decode_responses=True,
+                                        socket_timeout=socket_timeout,
+                                        socket_connect_timeout=socket_timeout)]
+            names        = [f"{host}:{port}"]
+
+        self.ring          = HashRing(names)
+        self.client        = self.clients[0]   # kept for callers using a single node
+        self.trust_storage = trust_storage or os.getenv("TRUST_STORAGE", "string")
+        self.trust_buckets = int(trust_buckets or os.getenv("TRUST_BUCKETS", DEFAULT_BUCKETS))
+        self.legacy_fallback = legacy_fallback
+
+        if self.trust_storage not in ("string", "hash"):
+            raise ValueError(f"Unknown TRUST_STORAGE: {self.trust_storage!r}")
 
+    # ----------------------------------
+    # Routing
+    # ----------------------------------
+    def client_for(self, key):
+        return self.clients[self.ring.node_index(key)]
+
+    def trust_bucket_key(self, user_id):
+        bucket = zlib.crc32(str(user_id).encode()) % self.trust_buckets
+        return f"{TRUST_BUCKET_PREFIX}{bucket}"
+
+    # ----------------------------------
+    # Attack intensity (global)
+    # ----------------------------------
     def get_attack_intensity(self):
-        value = self.client.get("attack_intensity")
+        value = self.client_for("attack_intensity").get("attack_intensity")
         return float(value) if value else 0.0
 
     def set_attack_intensity(self, value):
-        self.client.set("attack_intensity", value)
+        self.client_for("attack_intensity").set("attack_intensity", value)
 
+    # ----------------------------------
+    # User trust
+    # ----------------------------------
     def get_user_trust(self, user_id):
-        trust = self.client.get(f"user_trust:{user_id}")
+        if self.trust_storage == "hash":
+            key   = self.trust_bucket_key(user_id)
+            trust = self.client_for(key).hget(key, user_id)
+            if trust is None and self.legacy_fallback:
+                legacy = f"{TRUST_KEY_PREFIX}{user_id}"
+                trust  = self.client_for(legacy).get(legacy)
+        else:
+            key   = f"{TRUST_KEY_PREFIX}{user_id}"
+            trust = self.client_for(key).get(key)
         return int(trust) if trust else 0
 
     def set_user_trust(self, user_id, trust):
-        self.client.set(f"user_trust:{user_id}", trust)
\ No newline at end of file
+        if self.trust_storage == "hash":
+            key = self.trust_bucket_key(user_id)
+            self.client_for(key).hset(key, user_id, trust)
+        else:
+            key = f"{TRUST_KEY_PREFIX}{user_id}"
+            self.client_for(key).set(key, trust)
@@ -1,14 +1,72 @@
 # remapper.py
+import math
 import numpy as np
 
 class PiecewiseLinearRemapper:
-    def __init__(self, anchors):
+    """
+    Piecewise linear map between anchor points, bit-identical to np.interp.
+
+    The segment for an input is found through a dense lookup table over
+    the anchor range instead of a binary search: cells are at most half
+    the narrowest segment wide, so the table entry is off by at most one
+    segment and a single comparison on each side corrects it. The value
+    is then computed exactly as np.interp does — slope * (x - xp[j]) + fp[j].
+    """
+
+    def __init__(self, anchors, table_size=1024):
         self.anchors = sorted(anchors, key=lambda x: x[0])
-        self.raw_pts    = np.array([a[0] for a in self.anchors])
-        self.target_pts = np.array([a[1] for a in self.anchors])
+        self.raw_pts    = np.array([a[0] for a in self.anchors], dtype=np.float64)
+        self.target_pts = np.array([a[1] for a in self.anchors], dtype=np.float64)
+
+        widths = np.diff(self.raw_pts)
+        if len(self.anchors) < 2 or np.any(widths <= 0):
+            raise ValueError("anchors need at least two distinct raw points")
+
+        self.slopes = np.diff(self.target_pts) / widths
+
+        lo, hi = self.raw_pts[0], self.raw_pts[-1]
+        size   = max(table_size, int(math.ceil(2 * (hi - lo) / widths.min())) + 1)
+        edges  = lo + np.arange(size) * ((hi - lo) / size)
+        self.table     = np.clip(np.searchsorted(self.raw_pts, edges, side="right") - 1,
+                                 0, len(self.anchors) - 2)
+        self.table_inv = size / (hi - lo)
+
+        # Python copies for the scalar path — no numpy boxing per request
+        self._xp     = self.raw_pts.tolist()
+        self._fp     = self.target_pts.tolist()
+        self._slopes = self.slopes.tolist()
+        self._table  = self.table.tolist()
+        self._last   = len(self.anchors) - 2
 
     def transform(self, raw: float) -> float:
-        return float(np.interp(raw, self.raw_pts, self.target_pts))
+        x  = float(raw)
+        xp = self._xp
+        if x != x:
+            return x
+        if x < xp[0]:
+            return self._fp[0]
+        if x >= xp[-1]:
+            return self._fp[-1]
+
+        cell = min(int((x - xp[0]) * self.table_inv), len(self._table) - 1)
+        j    = self._table[cell]
+        if j < self._last and x >= xp[j + 1]:
+            j += 1
+        elif j > 0 and x < xp[j]:
+            j -= 1
+        return self._slopes[j] * (x - xp[j]) + self._fp[j]
 
     def transform_array(self, arr):
-        return np.interp(arr, self.raw_pts, self.target_pts)
\ No newline at end of file
+        x  = np.asarray(arr, dtype=np.float64)
+        xp = self.raw_pts
+
+        cell = np.nan_to_num((x - xp[0]) * self.table_inv, nan=0.0)
+        cell = np.clip(cell, 0, len(self.table) - 1).astype(np.intp)
+        j    = self.table[cell]
+        j    = np.where((j < self._last) & (x >= xp[np.minimum(j + 1, self._last + 1)]), j + 1, j)
+        j    = np.where((j > 0) & (x < xp[j]), j - 1, j)
+
+        out = self.slopes[j] * (x - xp[j]) + self.target_pts[j]
+        out = np.where(x < xp[0],   self.target_pts[0],  out)
+        out = np.where(x >= xp[-1], self.target_pts[-1], out)
+        return np.where(np.isnan(x), x, out)